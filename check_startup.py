@@ -0,0 +1,93 @@
+""" Check that the env-only modules start fast and without heavy imports.
+
+    Every module in MODULES is imported in a fresh interpreter, the same
+    way a spawned worker process starts, and a PlatformerEnv is reset once.
+    The run fails if that takes longer than the budget or if any module in
+    HEAVY got imported along the way. Afterwards one DQN is built for the
+    env's state shape, outside the budget, so a model that no longer builds
+    with the installed Keras fails the check too.
+
+        python check_startup.py --budget 1.0
+"""
+import json
+import os
+import subprocess
+import sys
+import time
+
+MODULES = ("platformer_example", "environment", "level_generator",
+           "demonstrations", "evaluate", "sweep")
+HEAVY = ("tensorflow", "keras", "scipy", "matplotlib")
+
+CHILD = """
+import json, sys, time
+start = time.perf_counter()
+for name in %r:
+    __import__(name)
+imported = time.perf_counter()
+import environment
+env = environment.PlatformerEnv()
+env.reset()
+done = time.perf_counter()
+stats = {
+    "import": imported - start,
+    "first_reset": done - imported,
+    "heavy": sorted(name for name in %r if name in sys.modules),
+    "ready": time.time(),
+}
+if %r:
+    import the_brain
+    agent = the_brain.DQN(env.state_shape, env.ACTIONS)
+    agent.model.predict_on_batch(the_brain.stack_states([(env.frames, env.last_action)], env.ACTIONS))
+    stats["model"] = time.perf_counter() - done
+print(json.dumps(stats))
+"""
+
+
+def measure(model=True):
+    """ Run the child interpreter and return its timings, plus the total
+        wall time from launch until the env was reset, including
+        interpreter start up. Raises CalledProcessError if the child
+        fails. """
+    here = os.path.dirname(os.path.abspath(__file__))
+    start = time.time()
+    out = subprocess.run([sys.executable, "-c", CHILD % (MODULES, HEAVY, model)],
+                         cwd=here, check=True, capture_output=True, text=True,
+                         env=dict(os.environ, PYGAME_HIDE_SUPPORT_PROMPT="1"))
+    stats = json.loads(out.stdout.strip().splitlines()[-1])
+    stats["total"] = stats["ready"] - start
+    return stats
+
+
+def main():
+    import argparse
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--budget", type=float, default=1.0,
+                        help="seconds allowed for a worker to start")
+    parser.add_argument("--no-model", dest="model", action="store_false",
+                        help="skip building a DQN")
+    args = parser.parse_args()
+
+    try:
+        stats = measure(args.model)
+    except subprocess.CalledProcessError as e:
+        print(e.stderr.strip().splitlines()[-1] if e.stderr.strip() else e)
+        sys.exit(1)
+    print("imports     %.3fs" % stats["import"])
+    print("first reset %.3fs" % stats["first_reset"])
+    print("total       %.3fs (budget %.3fs)" % (stats["total"], args.budget))
+    if "model" in stats:
+        print("model build %.3fs" % stats["model"])
+
+    ok = True
+    if stats["heavy"]:
+        print("heavy modules imported:", ", ".join(stats["heavy"]))
+        ok = False
+    if stats["total"] > args.budget:
+        print("over budget")
+        ok = False
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+from dataclasses import dataclass, asdict, fields, replace
+
+
+@dataclass
+class TrainingConfig:
+    """ Hyperparameters of a training run. The defaults are the values
+        the_brain.DQN and platformer_example.main used to hardcode. """
+
+    # DQN
+    gamma: float = 0.85
+    epsilon: float = 1.
+    epsilon_min: float = 0.01
+    epsilon_decay: float = 0.995
+    learning_rate: float = 0.05
+    tau: float = .125
+
+    # Replay
+    memory_size: int = 10000
+    best_memory_size: int = 100
+    random_memory_size: int = 100
+    batch_size: int = 32
+
+    # Game loop
+    compute_once_every: int = 20
+
+    # Network input, see observation.ObservationSpec. The crop is in
+    # screen pixels, the screen is 800x600.
+    history: int = 2
+    downscale_factor: int = 5
+    crop_left: int = 0
+    crop_top: int = 0
+    crop_right: int = 800
+    crop_bottom: int = 600
+
+    def to_dict(self):
+        return asdict(self)
+
+    def updated(self, **overrides):
+        """ Copy of this config with some fields changed. """
+        return replace(self, **overrides)
+
+    @classmethod
+    def parse_value(cls, name, text):
+        """ Convert a command line string to the type of field name. """
+        for field in fields(cls):
+            if field.name == name:
+                return field.type(text)
+        raise ValueError("unknown config field %r" % name)
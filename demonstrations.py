@@ -0,0 +1,93 @@
+import numpy as np
+
+# Arrays stored in a demonstration file, one entry per agent step. frames
+# is the frame stack of the state and new_frames the frame that gets
+# pushed onto it for the next state (see observation.ObservationSpec).
+FIELDS = ("frames", "new_frames", "last_actions", "actions", "rewards", "dones")
+
+
+class DemoRecorder(object):
+    """ Collects the steps of human play in compact form (uint8 frames,
+        int8 actions) and writes them to a compressed .npz file. """
+
+    def __init__(self, path):
+        if not path.endswith(".npz"):
+            path += ".npz"
+        self.path = path
+        self.steps = {field: [] for field in FIELDS}
+
+    def __len__(self):
+        return len(self.steps["actions"])
+
+    def add(self, state, new_frame, action, reward, done):
+        """ Record one step. state is the (frames, last_action) the action
+            was chosen in, new_frame what ObservationSpec.frame returned
+            after it. """
+        frames, last_action = state
+        for field, value in zip(FIELDS, (frames, new_frame, last_action,
+                                         action, reward, done)):
+            self.steps[field].append(value)
+
+    def save(self):
+        """ Write everything recorded so far to self.path. """
+        np.savez_compressed(
+            self.path,
+            frames=np.array(self.steps["frames"], dtype=np.uint8),
+            new_frames=np.array(self.steps["new_frames"], dtype=np.uint8),
+            last_actions=np.array(self.steps["last_actions"], dtype=np.int8),
+            actions=np.array(self.steps["actions"], dtype=np.int8),
+            rewards=np.array(self.steps["rewards"], dtype=np.float32),
+            dones=np.array(self.steps["dones"], dtype=bool))
+
+
+def load_demonstrations(paths):
+    """ Load one or more demonstration files into a single dict of arrays. """
+    if isinstance(paths, str):
+        paths = [paths]
+    parts = []
+    for path in paths:
+        with np.load(path) as data:
+            parts.append({field: data[field] for field in FIELDS})
+    return {field: np.concatenate([part[field] for part in parts]) for field in FIELDS}
+
+
+def make_states(demos, index):
+    """ Rebuild the agent's states and new states for the given steps,
+        the same way platformer_example.main builds them. """
+    frames = demos["frames"][index]
+    new_frames = np.concatenate([demos["new_frames"][index][:, :, :, None],
+                                 frames[:, :, :, :-1]], axis=3)
+    last_actions = demos["last_actions"][index].tolist()
+    actions = demos["actions"][index].tolist()
+    return list(zip(frames, last_actions)), list(zip(new_frames, actions))
+
+
+def iter_batches(demos, batch_size=256, shuffle=True, seed=None):
+    """ Yield (states, actions, rewards, new_states, dones) batches. """
+    order = np.arange(len(demos["actions"]))
+    if shuffle:
+        np.random.default_rng(seed).shuffle(order)
+    for start in range(0, len(order), batch_size):
+        index = order[start:start + batch_size]
+        states, new_states = make_states(demos, index)
+        yield (states, demos["actions"][index], demos["rewards"][index],
+               new_states, demos["dones"][index])
+
+
+def push_to_memory(agent, demos, best=False, batch_size=1024):
+    """ Put every demonstrated step into the agent's replay memory, or
+        into its best memories when best is True. """
+    remember = agent.remember_best if best else agent.remember
+    for states, actions, rewards, new_states, dones in iter_batches(demos, batch_size, shuffle=False):
+        for step in zip(states, actions.tolist(), rewards.tolist(), new_states, dones.tolist()):
+            remember(*step)
+
+
+def pretrain(agent, demos, epochs=1, batch_size=256, seed=None):
+    """ Train agent.model on the demonstrations with large batched TD
+        updates, syncing the target model after every epoch. """
+    for epoch in range(epochs):
+        for batch in iter_batches(demos, batch_size, seed=None if seed is None else seed + epoch):
+            agent.fit_batch(*batch)
+        agent.target_model.set_weights(agent.model.get_weights())
+        print("pretrain epoch", epoch + 1, "of", epochs)
@@ -0,0 +1,175 @@
+import pygame
+
+import level_loader
+import level_generator
+import platformer_example as game
+from observation import ObservationSpec
+
+
+class PlatformerEnv(object):
+    """ The game from platformer_example.main without a window, so it can
+        run in worker processes.
+
+        Every step applies one action and then runs compute_once_every
+        frames. The score, reward and game over rules are the ones main()
+        uses, except that the time limits count frames at the nominal
+        frame rate instead of wall clock seconds, and nothing is drawn
+        until the frame the observation is taken from. """
+
+    ACTIONS = 5
+
+    def __init__(self, level="level_01", compute_once_every=20, observation=None,
+                 fps=120, episode_seconds=30, idle_seconds=3, **generator_kwargs):
+        """ level is a level name or file for level_loader.load_level, a
+            CompiledLevel, or None for a new generated level on every reset
+            (generator_kwargs go to level_generator.generate_level).
+            observation is an ObservationSpec, the default one if None. """
+        self.level = level
+        self.generator_kwargs = generator_kwargs
+        self.compute_once_every = compute_once_every
+        self.observation = observation if observation is not None else ObservationSpec()
+        self.max_frames = fps * episode_seconds
+        self.idle_frames = fps * idle_seconds
+        self.state_shape = self.observation.shape
+
+        self.screen = pygame.Surface([game.SCREEN_WIDTH, game.SCREEN_HEIGHT])
+
+    def _compiled_level(self, seed):
+        if self.level is None:
+            return level_generator.generate_compiled(seed, **self.generator_kwargs)
+        if isinstance(self.level, level_loader.CompiledLevel):
+            return self.level
+        return level_loader.load_level(self.level)
+
+    def world_x(self):
+        return self.player.rect.x - self.current_level.world_shift
+
+    def position_score(self):
+        x = self.world_x()
+        return x / 100 + (x // 10) * 1000
+
+    def reset(self, seed=None):
+        """ Start a new episode and return the first state. seed picks
+            the generated level when the env has no fixed level. """
+        self.player = game.Player()
+        self.current_level = game.DataLevel(self.player, self._compiled_level(seed))
+        self.player.level = self.current_level
+
+        self.player.rect.x = 340
+        self.player.rect.y = game.SCREEN_HEIGHT - self.player.rect.height - game.LOWER_BORDER
+        self.active_sprite_list = pygame.sprite.Group(self.player)
+
+        self.frame = 0
+        self.last_right_frame = 0
+        self.score = self.position_score()
+        self.pain_counter = 0
+        self.last_action = 1
+        self.completed = False
+        self.max_x = self.world_x()
+
+        self.frames = self.observation.first(self._observe())
+        return (self.frames, self.last_action)
+
+    def _observe(self):
+        self.current_level.draw(self.screen)
+        self.active_sprite_list.draw(self.screen)
+        return self.observation.frame(self.screen)
+
+    def _apply(self, action):
+        player = self.player
+        if player.change_x < 0 or player.change_x > 0:
+            player.stop()
+
+        if action == 0:
+            player.jump()
+            player.go_left()
+        elif action == 1:
+            player.go_left()
+        elif action == 2:
+            player.jump()
+        elif action == 3:
+            player.go_right()
+            self.last_right_frame = self.frame
+        elif action == 4:
+            player.go_right()
+            player.jump()
+            self.last_right_frame = self.frame
+
+    def _tick(self, score_before, decision_x):
+        """ Run one frame, return True when the episode is over. """
+        player = self.player
+        level = self.current_level
+        self.frame += 1
+
+        self.active_sprite_list.update()
+        level.update()
+
+        if player.rect.right >= 500:
+            diff = player.rect.right - 500
+            player.rect.right = 500
+            level.shift_world(-diff)
+
+        if player.rect.left <= 120:
+            diff = 120 - player.rect.left
+            player.rect.left = 120
+            level.shift_world(diff)
+
+        done = False
+        if player.rect.x + level.world_shift < level.level_limit:
+            self.completed = True
+            done = True
+
+        x = self.world_x()
+        self.max_x = max(self.max_x, x)
+        score = self.position_score()
+
+        if player.rect.y > 510:
+            score = score_before - 10
+            done = True
+
+        if x == decision_x:
+            score *= 0.98
+
+        if self.frame - self.last_right_frame > self.idle_frames:
+            done = True
+
+        if self.frame > self.max_frames:
+            done = True
+
+        if score_before < 0:
+            done = True
+            score = -100
+
+        if score < -250:
+            done = True
+
+        self.score = score
+        return done
+
+    def step(self, action):
+        """ Returns (state, reward, done, info) like gym. info has the
+            distance reached, whether the level was completed and the
+            number of frames played. """
+        decision_x = self.world_x()
+        decision_y = self.player.rect.y
+        score_before = self.score
+
+        self._apply(action)
+        done = False
+        for _ in range(self.compute_once_every):
+            done = self._tick(score_before, decision_x)
+            if done:
+                break
+
+        reward = self.score - score_before
+        if decision_x == self.world_x() and decision_y == self.player.rect.y:
+            reward = -100 + self.pain_counter
+            self.pain_counter -= 100
+        else:
+            self.pain_counter = 0
+
+        self.frames = self.observation.push(self.frames, self._observe())
+        self.last_action = action
+
+        info = {"distance": self.max_x, "completed": self.completed, "frames": self.frame}
+        return (self.frames, self.last_action), reward / 100, done, info
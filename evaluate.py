@@ -0,0 +1,131 @@
+import time
+
+import numpy as np
+
+import workers
+from config import TrainingConfig
+from observation import ObservationSpec
+
+_model = None
+_env_kwargs = None
+
+
+def _init_worker(model_path, env_kwargs):
+    global _model, _env_kwargs
+    from keras.models import load_model
+    _model = load_model(model_path, compile=False)
+    _env_kwargs = env_kwargs
+
+
+def _run_episode(task):
+    """ Play one episode with the greedy policy (or epsilon-greedy with a
+        seeded generator) and return its stats. """
+    import environment
+    import the_brain as ch4d
+    level, seed, epsilon = task
+    env = environment.PlatformerEnv(level=level, **_env_kwargs)
+    rng = np.random.default_rng(seed)
+
+    if tuple(_model.input_shape[0][1:]) != env.state_shape:
+        raise ValueError("model takes frames of shape %r, the observation spec gives %r"
+                         % (tuple(_model.input_shape[0][1:]), env.state_shape))
+
+    start = time.time()
+    state = env.reset(seed=seed)
+    done = False
+    while not done:
+        if rng.random() < epsilon:
+            action = int(rng.integers(env.ACTIONS))
+        else:
+            action = int(np.argmax(_model.predict_on_batch(ch4d.stack_states([state], env.ACTIONS))[0]))
+        state, reward, done, info = env.step(action)
+
+    return {
+        "level": "generated" if level is None else level,
+        "seed": seed,
+        "distance": info["distance"],
+        "completed": info["completed"],
+        "frames": info["frames"],
+        "seconds": time.time() - start,
+    }
+
+
+def evaluate(model_path, levels=("level_01",), episodes=8, seed=0, epsilon=0.,
+             processes=None, **env_kwargs):
+    """ Score a model saved with DQN.save_model.
+
+        Runs episodes episodes on every level in levels across a pool of
+        processes. A level of None means a generated level, one per episode.
+        env_kwargs go to PlatformerEnv, pass the observation spec the model
+        was trained with as observation.
+        Episode i always gets seed seed + i, so two models evaluated with
+        the same arguments see the same levels. Returns one dict per
+        episode. """
+    tasks = [(level, seed + i, epsilon) for level in levels for i in range(episodes)]
+    processes = min(processes or len(workers.available_cores()), len(tasks))
+
+    # One thread per worker, the parallelism comes from the process pool
+    with workers.pool(processes, 1, _init_worker, (model_path, env_kwargs)) as pool:
+        return pool.map(_run_episode, tasks, chunksize=1)
+
+
+def summarize(results, wall_seconds=None):
+    """ Print distance, completion rate and speed per level. """
+    print("%-12s %8s %10s %10s %10s %10s" % (
+        "level", "episodes", "distance", "best", "completed", "frames/s"))
+    by_level = {}
+    for result in results:
+        by_level.setdefault(result["level"], []).append(result)
+    for level, rows in by_level.items():
+        distance = np.array([row["distance"] for row in rows])
+        frames = sum(row["frames"] for row in rows)
+        seconds = sum(row["seconds"] for row in rows)
+        print("%-12s %8d %10.0f %10d %9.0f%% %10.0f" % (
+            level, len(rows), distance.mean(), distance.max(),
+            100. * np.mean([row["completed"] for row in rows]),
+            frames / seconds))
+    if wall_seconds:
+        frames = sum(row["frames"] for row in results)
+        print("%d frames in %.1fs, %.0f frames/s over all workers" % (
+            frames, wall_seconds, frames / wall_seconds))
+
+
+def main():
+    import argparse
+    defaults = TrainingConfig()
+    parser = argparse.ArgumentParser(description="Greedy evaluation of a saved model")
+    parser.add_argument("model", help="file written by DQN.save_model")
+    parser.add_argument("--levels", nargs="+", default=["level_01"],
+                        help="level names or files, 'generated' for procedural levels")
+    parser.add_argument("--episodes", type=int, default=8)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--epsilon", type=float, default=0.)
+    parser.add_argument("--difficulty", type=float, default=.5,
+                        help="difficulty of the generated levels")
+    parser.add_argument("--processes", type=int, default=None)
+    parser.add_argument("--compute-once-every", type=int, default=defaults.compute_once_every)
+    parser.add_argument("--history", type=int, default=defaults.history,
+                        help="frames the model was trained on")
+    parser.add_argument("--downscale-factor", type=int, default=defaults.downscale_factor)
+    parser.add_argument("--crop", type=int, nargs=4,
+                        default=[defaults.crop_left, defaults.crop_top,
+                                 defaults.crop_right, defaults.crop_bottom],
+                        metavar=("LEFT", "TOP", "RIGHT", "BOTTOM"))
+    args = parser.parse_args()
+
+    levels = [None if level == "generated" else level for level in args.levels]
+    env_kwargs = {
+        "compute_once_every": args.compute_once_every,
+        "observation": ObservationSpec(args.history, args.downscale_factor, args.crop),
+    }
+    if None in levels:
+        env_kwargs["difficulty"] = args.difficulty
+
+    start = time.time()
+    results = evaluate(args.model, levels, args.episodes, args.seed, args.epsilon,
+                       args.processes, **env_kwargs)
+    summarize(results, time.time() - start)
+
+
+if __name__ == "__main__":
+    main()
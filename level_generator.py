@@ -0,0 +1,367 @@
+import numpy as np
+
+import level_loader
+
+# These must match the physics in platformer_example.Player
+JUMP_SPEED = 10
+GRAVITY = .35
+RUN_SPEED = 6
+PLAYER_WIDTH = 40
+PLAYER_HEIGHT = 60
+PLAYER_START_X = 340
+
+# Floor layout, same as LOWER_BORDER / LOWER_BORDER_LIMIT in platformer_example
+FLOOR_HEIGHT = 50
+FLOOR_Y = 550
+
+# How far below the take off point we still look for a landing
+MAX_FALL = 600
+
+SEGMENTS = ("flat", "blocks", "hole", "pipes", "staircase", "moving")
+
+
+def _jump_table():
+    """ Simulate a jump from flat ground the same way Player.update does
+        (pygame rounds rect positions) and return the apex height and, for
+        every rise from -MAX_FALL to the apex, how many pixels the player
+        can run before landing on a surface at that rise. """
+    y = 0
+    change_y = -JUMP_SPEED
+    frames = []
+    while y < MAX_FALL:
+        change_y += GRAVITY
+        y = int(np.floor(y + change_y + .5))
+        frames.append((y, change_y))
+
+    apex = -min(y for y, _ in frames)
+    reach = np.full(MAX_FALL + apex + 1, -1, dtype=np.int32)
+    for rise in range(-MAX_FALL, apex + 1):
+        for t, (y, change_y) in enumerate(frames, 1):
+            # Land on the first frame we are falling and below the surface
+            if change_y > 0 and y > -rise:
+                reach[rise + MAX_FALL] = t * RUN_SPEED
+                break
+    return apex, reach
+
+
+JUMP_APEX, _JUMP_REACH = _jump_table()
+
+
+def _surfaces(left, right, top, bottom, solid):
+    """ Split the tops of the nodes into the parts the player can stand on,
+        leaving out where a solid rect sits on a top or hangs too low above
+        it for the player to fit. Returns left, right, top and the index of
+        the node of every surface. """
+    surfaces = []
+    for i in range(len(left)):
+        pieces = [(left[i], right[i])]
+        cover = (solid & (top < top[i]) & (bottom > top[i] - PLAYER_HEIGHT)
+                 & (left < right[i]) & (right > left[i]))
+        for j in np.flatnonzero(cover):
+            pieces = [(lo, hi) for start, end in pieces
+                      for lo, hi in ((start, min(end, left[j])), (max(start, right[j]), end))
+                      if lo < hi]
+        surfaces.extend((lo, hi, top[i], i) for lo, hi in pieces)
+    surfaces = np.array(surfaces, dtype=np.int32).reshape(-1, 4)
+    return surfaces[:, 0], surfaces[:, 1], surfaces[:, 2], surfaces[:, 3]
+
+
+def _expand(left, right, top, reached, solids, apex, reach):
+    """ Breadth first search over the surfaces from _surfaces. reached is
+        a bool mask of the surfaces we start from and is updated in place.
+        solids is (left, right, top, bottom) of the solid rects.
+
+        A surface can jump to another if the height difference and
+        horizontal gap fit in the jump table, and no solid rect between
+        them (or at the point where they touch) is a wall: reaching above
+        the apex of the jump and too low to pass under. Ceilings are not
+        considered. """
+    solid_left, solid_right, solid_top, solid_bottom = solids
+    queue = list(np.flatnonzero(reached))
+    while queue:
+        a = queue.pop()
+        gap = np.maximum(left - right[a], left[a] - right)
+        dx = np.maximum(0, gap - (PLAYER_WIDTH - 2))
+        rise = top[a] - top
+        in_table = (rise <= apex) & (rise >= -MAX_FALL)
+        ok = ~reached & in_table
+        ok[ok] = dx[ok] <= reach[rise[ok] + MAX_FALL]
+
+        wall = (solid_top < top[a] - apex) & (solid_bottom > top[a] - PLAYER_HEIGHT)
+        for b in np.flatnonzero(ok):
+            lo = min(right[a], right[b])
+            hi = max(left[a], left[b])
+            if np.any(wall & (solid_left < hi) & (solid_right > lo)):
+                continue
+            reached[b] = True
+            queue.append(b)
+    return reached
+
+
+def _limits(margin):
+    apex = int(JUMP_APEX * margin)
+    reach = (_JUMP_REACH * margin).astype(np.int32)
+    return apex, reach
+
+
+def _level_nodes(level):
+    """ left, right, top and bottom of every rect, plus whether it is
+        solid. See _moving_nodes for the moving platforms, they are not
+        treated as solid. """
+    left = list(level.rects[:, 2])
+    right = list(level.rects[:, 2] + level.rects[:, 0])
+    top = list(level.rects[:, 3])
+    bottom = list(level.rects[:, 3] + level.rects[:, 1])
+    solid = [True] * len(left)
+    for row in level.moving.tolist():
+        mp = dict(zip(level_loader.MOVING_FIELDS, row))
+        for x, y, width in _moving_nodes(mp):
+            left.append(x)
+            right.append(x + width)
+            top.append(y)
+            bottom.append(y + mp["height"])
+            solid.append(False)
+    return tuple(np.array(nodes, dtype=np.int32) for nodes in (left, right, top, bottom)) \
+        + (np.array(solid, dtype=bool),)
+
+
+def _search(left, right, top, bottom, solid, start, apex, reach):
+    """ Run _expand over the surfaces of the given nodes. start(s_left,
+        s_right, s_top, owner) gives the surfaces to start from. Returns
+        the surfaces and which of them were reached. """
+    surfaces = _surfaces(left, right, top, bottom, solid)
+    reached = start(*surfaces)
+    solids = (left[solid], right[solid], top[solid], bottom[solid])
+    _expand(surfaces[0], surfaces[1], surfaces[2], reached, solids, apex, reach)
+    return surfaces, reached
+
+
+def _moving_nodes(mp):
+    """ x, y and width of the surfaces a moving platform stands in for.
+        A horizontal one is a single surface covering its whole path, a
+        vertical one a ladder of surfaces 50px apart so the search can ride
+        it up and down. """
+    if mp["change_x"]:
+        return [(mp["boundary_left"], mp["y"],
+                 mp["boundary_right"] - mp["boundary_left"] + mp["width"])]
+    if mp["change_y"]:
+        lowest = mp["boundary_bottom"] - mp["height"]
+        ys = list(range(mp["boundary_top"], lowest, 50)) + [lowest]
+        return [(mp["x"], y, mp["width"]) for y in ys]
+    return [(mp["x"], mp["y"], mp["width"])]
+
+
+def goal_x(level_limit):
+    """ World x the player has to reach to finish a level. The level
+        changes when player.rect.x + world_shift < level_limit, and the
+        world scrolls to keep player.rect.right at 500. """
+    return -level_limit + 2 * (500 - PLAYER_WIDTH)
+
+
+def is_reachable(level, margin=.9):
+    """ Check that the end of a CompiledLevel can be reached from the start
+        position. margin scales the jump height and distance down so a
+        level does not depend on pixel perfect jumps. """
+    def start(left, right, top, owner):
+        return (left <= PLAYER_START_X) & (right > PLAYER_START_X) & (top == FLOOR_Y)
+
+    (_, right, _, _), reached = _search(*_level_nodes(level), start, *_limits(margin))
+    return bool(np.any(reached & (right >= goal_x(level.level_limit))))
+
+
+class _Builder(object):
+    """ Collects the platforms of a level while it is being generated and
+        keeps track of which of them are reachable. """
+
+    def __init__(self, margin):
+        self.apex, self.reach = _limits(margin)
+        # Tallest obstacle that can be jumped onto from the floor
+        self.max_obstacle = self.apex // 50 * 50
+        self.platforms = []
+        self.moving_platforms = []
+        self.left = []
+        self.right = []
+        self.top = []
+        self.bottom = []
+        self.solid = []
+        self.reached = []
+        self.x = 0
+        self.last_floor = None
+
+    def mark(self):
+        return (len(self.platforms), len(self.moving_platforms), len(self.left),
+                self.x, self.last_floor)
+
+    def rollback(self, mark):
+        n_platforms, n_moving, n_nodes, self.x, self.last_floor = mark
+        del self.platforms[n_platforms:]
+        del self.moving_platforms[n_moving:]
+        for nodes in (self.left, self.right, self.top, self.bottom, self.solid, self.reached):
+            del nodes[n_nodes:]
+
+    def _node(self, x, y, width, height, solid=True):
+        self.left.append(x)
+        self.right.append(x + width)
+        self.top.append(y)
+        self.bottom.append(y + height)
+        self.solid.append(solid)
+        self.reached.append(False)
+
+    def block(self, width, height, x, y):
+        self.platforms.append([int(width), int(height), int(x), int(y)])
+        self._node(x, y, width, height)
+
+    def floor(self, length):
+        # Multiples of 10 keep the number of distinct platform surfaces small
+        length = max(10, int(length) // 10 * 10)
+        self.block(length, FLOOR_HEIGHT, self.x, FLOOR_Y)
+        self.x += length
+        self.last_floor = len(self.left) - 1
+
+    def moving(self, **mp):
+        mp = {field: int(mp.get(field, 0)) for field in level_loader.MOVING_FIELDS}
+        self.moving_platforms.append(mp)
+        for x, y, width in _moving_nodes(mp):
+            self._node(x, y, width, mp["height"], solid=False)
+
+    def check(self, since):
+        """ Extend reachability to the nodes added after since and return
+            whether the last floor piece is reachable. Only the nodes of
+            the previous and current segment take part in the search. A
+            node counts as reached when any part of its top is. """
+        nodes = [np.array(values[since:], dtype=np.int32)
+                 for values in (self.left, self.right, self.top, self.bottom)]
+        solid = np.array(self.solid[since:], dtype=bool)
+        node_reached = np.array(self.reached[since:], dtype=bool)
+
+        def start(left, right, top, owner):
+            return node_reached[owner]
+
+        (_, _, _, owner), reached = _search(*nodes, solid, start, self.apex, self.reach)
+        node_reached[owner[reached]] = True
+        self.reached[since:] = node_reached.tolist()
+        return self.reached[self.last_floor]
+
+
+def _flat(b, rng, difficulty):
+    b.floor(rng.integers(300, 800))
+
+
+def _blocks(b, rng, difficulty):
+    start = b.x
+    b.floor(rng.integers(600, 1000))
+    x = start + rng.integers(50, 150)
+    while x < b.x - 150:
+        width = 50 * rng.integers(1, 6)
+        # At least 150 up so the player can still walk underneath
+        rise = rng.integers(3, 5 + int(3 * difficulty)) * 50
+        b.block(width, 50, x, FLOOR_Y - rise)
+        x += width + rng.integers(50, 250)
+
+
+def _hole(b, rng, difficulty):
+    b.x += rng.integers(60, 80 + int(difficulty * 300))
+    b.floor(rng.integers(300, 700))
+
+
+def _pipes(b, rng, difficulty):
+    for _ in range(rng.integers(1, 4)):
+        b.floor(rng.integers(150, 300))
+        height = min(50 * rng.integers(1, 2 + int(2 * difficulty)), b.max_obstacle)
+        b.block(70, height, b.x, FLOOR_Y - height)
+        b.floor(70)
+    b.floor(rng.integers(150, 300))
+
+
+def _staircase(b, rng, difficulty):
+    b.floor(rng.integers(100, 300))
+    steps = rng.integers(2, 3 + int(3 * difficulty))
+    for i in range(1, steps + 1):
+        b.block(50, 50 * i, b.x, FLOOR_Y - 50 * i)
+        b.floor(50)
+    if rng.random() < .5 + difficulty / 2:
+        # Triangle jump, with a hole between the two sides
+        if rng.random() < difficulty:
+            b.x += rng.integers(50, 150)
+        else:
+            b.floor(rng.integers(50, 150))
+        for i in range(steps, 0, -1):
+            b.block(50, 50 * i, b.x, FLOOR_Y - 50 * i)
+            b.floor(50)
+    b.floor(rng.integers(150, 300))
+
+
+def _moving(b, rng, difficulty):
+    hole = rng.integers(250, 300 + int(difficulty * 300))
+    width = 70
+    start = b.x
+    y = FLOOR_Y - rng.integers(60, 120)
+    b.x += hole
+    b.moving(width=width, height=40, x=start, y=y,
+             boundary_left=start, boundary_right=b.x - width,
+             change_x=1 + int(difficulty * 2))
+    b.floor(rng.integers(300, 700))
+
+
+_SEGMENT_BUILDERS = {
+    "flat": _flat,
+    "blocks": _blocks,
+    "hole": _hole,
+    "pipes": _pipes,
+    "staircase": _staircase,
+    "moving": _moving,
+}
+
+
+def generate_level(seed, length=8000, difficulty=.5, segments=SEGMENTS, margin=.9):
+    """ Generate a level description in the level file format.
+
+        seed        -- anything np.random.default_rng accepts
+        length      -- world x of the end of the level
+        difficulty  -- 0 to 1, scales hole widths, obstacle heights and
+                       how often hard segments show up
+        segments    -- segment types to pick from (see SEGMENTS)
+        margin      -- see is_reachable
+
+        Every segment is checked against the jump physics as it is added
+        and replaced with flat floor if its end cannot be reached. """
+    rng = np.random.default_rng(seed)
+    b = _Builder(margin)
+
+    segments = list(segments)
+    weights = np.array([1. if s in ("flat", "blocks") else .5 + difficulty
+                        for s in segments])
+    weights /= weights.sum()
+
+    # Start area, the player is placed at x = PLAYER_START_X
+    b.floor(PLAYER_START_X + 300)
+    b.reached[b.last_floor] = True
+    since = 0
+
+    while b.x < length:
+        mark = b.mark()
+        _SEGMENT_BUILDERS[segments[rng.choice(len(segments), p=weights)]](b, rng, difficulty)
+        if not b.check(since):
+            b.rollback(mark)
+            b.floor(rng.integers(300, 800))
+            b.reached[b.last_floor] = True
+        since = mark[2]
+
+    # End area with the flag, same shape as in level_01
+    end = b.x + 200
+    b.floor(end + 600 - b.x)
+    b.block(50, 550, end, FLOOR_Y - 550)
+    b.block(50, 50, end - 50, FLOOR_Y - 550)
+    b.block(100, 50, end, FLOOR_Y - 500)
+    b.block(150, 50, end - 50, FLOOR_Y - 50)
+
+    return {
+        "level_limit": -(end - 80 - 2 * (500 - PLAYER_WIDTH)),
+        "platforms": b.platforms,
+        "moving_platforms": b.moving_platforms,
+    }
+
+
+def generate_compiled(seed, **kwargs):
+    """ generate_level followed by level_loader.compile_level. """
+    return level_loader.compile_level(generate_level(seed, **kwargs))
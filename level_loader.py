@@ -0,0 +1,56 @@
+import json
+import os
+from collections import namedtuple
+from functools import lru_cache
+
+import numpy as np
+
+LEVELS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "levels")
+
+# Column order of the moving platform table
+MOVING_FIELDS = ("width", "height", "x", "y",
+                 "boundary_left", "boundary_right",
+                 "boundary_top", "boundary_bottom",
+                 "change_x", "change_y")
+
+# rects:  (N, 4) int32 array of width, height, x, y sorted by x
+# moving: (M, len(MOVING_FIELDS)) int32 array
+CompiledLevel = namedtuple("CompiledLevel", ["level_limit", "rects", "moving"])
+
+
+def _read_only(arr):
+    arr.setflags(write=False)
+    return arr
+
+
+def compile_level(data):
+    """ Turn a level description (the dict stored in a level file) into
+        a CompiledLevel. The arrays are flagged read-only so the same
+        object can be shared by every Level that uses it. """
+    rects = np.array(data.get("platforms", []), dtype=np.int32).reshape(-1, 4)
+    rects = rects[np.argsort(rects[:, 2], kind="stable")]
+
+    moving = np.array([[mp.get(field, 0) for field in MOVING_FIELDS]
+                       for mp in data.get("moving_platforms", [])],
+                      dtype=np.int32).reshape(-1, len(MOVING_FIELDS))
+
+    return CompiledLevel(int(data["level_limit"]),
+                         _read_only(rects),
+                         _read_only(moving))
+
+
+def level_path(name):
+    """ Resolve a level name like "level_01" to its file in LEVELS_DIR.
+        Paths to existing files are returned unchanged. """
+    if os.path.isfile(name):
+        return name
+    return os.path.join(LEVELS_DIR, name + ".json")
+
+
+@lru_cache(maxsize=None)
+def load_level(name):
+    """ Load and compile a level file once per process, so every reset
+        of an episode reuses the parsed level. Worker processes are
+        spawned, each one loads the levels it plays itself. """
+    with open(level_path(name)) as f:
+        return compile_level(json.load(f))
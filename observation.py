@@ -0,0 +1,65 @@
+import numpy as np
+import pygame
+
+import the_brain as ch4d
+
+# Same as SCREEN_WIDTH / SCREEN_HEIGHT in platformer_example
+SCREEN_WIDTH = 800
+SCREEN_HEIGHT = 600
+
+
+class ObservationSpec(object):
+    """ How the screen becomes the network's image input.
+
+        A state is (frames, last_action). frames is a uint8 array of shape
+        self.shape holding the last history frames along the channels,
+        newest first. last_action goes to the network as a separate one
+        hot input (see the_brain.stack_states). """
+
+    def __init__(self, history=2, downscale_factor=5, crop=(0, 0, SCREEN_WIDTH, SCREEN_HEIGHT)):
+        """ crop is (left, top, right, bottom) in screen pixels, it must
+            be a non empty part of the screen with a width and height that
+            are multiples of downscale_factor. """
+        left, top, right, bottom = crop
+        if not (0 <= left < right <= SCREEN_WIDTH and 0 <= top < bottom <= SCREEN_HEIGHT):
+            raise ValueError("crop %r is not inside the %dx%d screen"
+                             % (crop, SCREEN_WIDTH, SCREEN_HEIGHT))
+        if (right - left) % downscale_factor or (bottom - top) % downscale_factor:
+            raise ValueError("crop %r is not a multiple of downscale_factor %d"
+                             % (crop, downscale_factor))
+        if history < 1:
+            raise ValueError("history must be at least 1, got %r" % history)
+
+        self.history = history
+        self.downscale_factor = downscale_factor
+        self.crop = tuple(crop)
+        self.frame_shape = ((bottom - top) // downscale_factor,
+                            (right - left) // downscale_factor)
+        self.shape = self.frame_shape + (history,)
+
+    @classmethod
+    def from_config(cls, config):
+        return cls(config.history, config.downscale_factor,
+                   (config.crop_left, config.crop_top, config.crop_right, config.crop_bottom))
+
+    def frame(self, surface=None):
+        """ Cropped, grayscale, downscaled copy of surface (the screen by
+            default) as a uint8 array of shape self.frame_shape. """
+        if surface is None:
+            surface = pygame.display.get_surface()
+        left, top, right, bottom = self.crop
+        pixels = pygame.surfarray.pixels3d(surface)
+        gray = ch4d.rgb2gray(pixels[left:right, top:bottom])
+        del pixels
+
+        # surfarray is indexed [x][y], the network wants rows first
+        frame = ch4d.block_mean(gray.T, self.downscale_factor)
+        return frame.round().astype(np.uint8)
+
+    def first(self, frame):
+        """ Frame stack at the start of an episode: frame repeated. """
+        return np.repeat(frame[:, :, None], self.history, axis=2)
+
+    def push(self, frames, frame):
+        """ New frame stack with frame added and the oldest one dropped. """
+        return np.concatenate([frame[:, :, None], frames[:, :, :-1]], axis=2)
@@ -1,5 +1,10 @@
 import pygame
 import the_brain as ch4d
+import level_loader
+import level_generator
+import demonstrations
+from config import TrainingConfig
+from observation import ObservationSpec
 import cProfile
 
 # Global constants
@@ -129,17 +134,28 @@ class Player(pygame.sprite.Sprite):
         self.change_x = 0
 
 
+_platform_images = {}
+
+
+def platform_image(width, height):
+    """ Filled platform surface, shared by every platform of that size. """
+    image = _platform_images.get((width, height))
+    if image is None:
+        image = pygame.Surface([width, height])
+        image.fill(GREEN)
+        _platform_images[(width, height)] = image
+    return image
+
+
 class Platform(pygame.sprite.Sprite):
     """ Platform the user can jump on """
 
     def __init__(self, width, height):
-        """ Platform constructor. Assumes constructed with user passing in
-            an array of 5 numbers like what's defined at the top of this code.
-            """
+        """ Platform constructor. Platforms never draw on their image, so
+            all platforms of the same size share one surface. """
         super().__init__()
 
-        self.image = pygame.Surface([width, height])
-        self.image.fill(GREEN)
+        self.image = platform_image(width, height)
 
         self.rect = self.image.get_rect()
 
@@ -258,160 +274,118 @@ class Level(object):
             enemy.rect.x += shift_x
 
 
-# Create platforms for the level
-class Level_01(Level):
-    """ Definition for level 1. """
+class DataLevel(Level):
+    """ A level built from a CompiledLevel (see level_loader). """
 
-    def __init__(self, player):
-        """ Create level 1. """
+    def __init__(self, player, compiled):
+        """ Create the platforms described by the compiled level. """
 
         # Call the parent constructor
         Level.__init__(self, player)
 
-        self.level_limit = -8000
-
-        # Array with width, height, x, and y of platform
-        level = [
-
-            # podelele
-            [500,  LOWER_BORDER, 0,    LOWER_BORDER_LIMIT],
-            
-            [2800,  LOWER_BORDER, 600,    LOWER_BORDER_LIMIT],
-            
-            [800,   LOWER_BORDER, 2900, LOWER_BORDER_LIMIT],
-            [1500, LOWER_BORDER, 3800, LOWER_BORDER_LIMIT],
-            [4000, LOWER_BORDER, 5400, LOWER_BORDER_LIMIT],
-
-
-                    # first set from the picture
-
-            #initial platforming
-            [50, 50, 700, LOWER_BORDER_LIMIT - 50 - 100],
-            [250, 50, 950, LOWER_BORDER_LIMIT - 50 - 100],
-            [50, 50, 1050, LOWER_BORDER_LIMIT - 50 - 250],
-
-            #pipes jumps
-            [70, 50, 1600, LOWER_BORDER_LIMIT - 50],
-            [70, 100, 1850, LOWER_BORDER_LIMIT - 100],
-            [70, 160, 2100, LOWER_BORDER_LIMIT - 150],
-            [70, 160, 2350, LOWER_BORDER_LIMIT - 150],
-
-
-                    # second set from the picture
-
-            #platforming over the second hole - 3800
-            [150, 50, 3300, LOWER_BORDER_LIMIT - 70 - 70],
-            [250, 50, 3550, LOWER_BORDER_LIMIT - 70 - 200],
-            [150, 50, 3900, LOWER_BORDER_LIMIT - 70 - 200],
-            [50, 50, 4000, LOWER_BORDER_LIMIT - 160],
-
-            [100, 50, 4200, LOWER_BORDER_LIMIT - 150],
-            [50, 50, 4500, LOWER_BORDER_LIMIT - 150],
-            [50, 50, 4600, LOWER_BORDER_LIMIT - 150],
-            [50, 50, 4600, LOWER_BORDER_LIMIT - 100 - 200],
-            [50, 50, 4700, LOWER_BORDER_LIMIT - 150],
-            [50, 50, 4900, LOWER_BORDER_LIMIT - 150],
-
-
-            #triangle jump over hole
-            [50, 50, 5050, LOWER_BORDER_LIMIT - 50],
-            [50, 100, 5100, LOWER_BORDER_LIMIT - 100],
-            [50, 150, 5150, LOWER_BORDER_LIMIT - 150],
-            [100, 200, 5200, LOWER_BORDER_LIMIT - 200],
-
-            [50, 200, 5400, LOWER_BORDER_LIMIT - 200],
-            [50, 150, 5450, LOWER_BORDER_LIMIT - 150],
-            [50, 100, 5500, LOWER_BORDER_LIMIT - 100],
-            [50, 50, 5550, LOWER_BORDER_LIMIT - 50],
-
-            # triangle jump
-            [50, 50, 6500, LOWER_BORDER_LIMIT - 50],
-            [50, 100, 6550, LOWER_BORDER_LIMIT - 100],
-            [50, 150, 6600, LOWER_BORDER_LIMIT - 150],
-            [50, 200, 6650, LOWER_BORDER_LIMIT - 200],
-
-            [50, 200, 6850, LOWER_BORDER_LIMIT - 200],
-            [50, 150, 6900, LOWER_BORDER_LIMIT - 150],
-            [50, 100, 6950, LOWER_BORDER_LIMIT - 100],
-            [50, 50, 7000, LOWER_BORDER_LIMIT - 50],
-
-
-
+        self.compiled = compiled
+        self.level_limit = compiled.level_limit
 
-
-
-            # flag
-            [50, 550, 9000, LOWER_BORDER_LIMIT - 550],
-            [50, 50, 8950, LOWER_BORDER_LIMIT - 550],
-            [100, 50, 9000, LOWER_BORDER_LIMIT - 500],
-            [150, 50, 8950, LOWER_BORDER_LIMIT - 50],
-
-        ]
-
-        # Go through the array above and add platforms
-        for platform in level:
-            block = Platform(platform[0], platform[1])
-            block.rect.x = platform[2]
-            block.rect.y = platform[3]
+        # Go through the static rects and add platforms
+        for width, height, x, y in compiled.rects.tolist():
+            block = Platform(width, height)
+            block.rect.x = x
+            block.rect.y = y
             block.player = self.player
             self.platform_list.add(block)
 
-        # Add a custom moving platform
-        block = MovingPlatform(70, 40)
-        block.rect.x = 1350
-        block.rect.y = 280
-        block.boundary_left = 1350
-        block.boundary_right = 1600
-        block.change_x = 1
-        block.player = self.player
-        block.level = self
-        self.platform_list.add(block)
+        # Add the moving platforms
+        for row in compiled.moving.tolist():
+            params = dict(zip(level_loader.MOVING_FIELDS, row))
+            block = MovingPlatform(params["width"], params["height"])
+            block.rect.x = params["x"]
+            block.rect.y = params["y"]
+            block.boundary_left = params["boundary_left"]
+            block.boundary_right = params["boundary_right"]
+            block.boundary_top = params["boundary_top"]
+            block.boundary_bottom = params["boundary_bottom"]
+            block.change_x = params["change_x"]
+            block.change_y = params["change_y"]
+            block.player = self.player
+            block.level = self
+            self.platform_list.add(block)
 
 
 # Create platforms for the level
-class Level_02(Level):
-    """ Definition for level 2. """
+class Level_01(DataLevel):
+    """ Definition for level 1. """
 
     def __init__(self, player):
         """ Create level 1. """
+        DataLevel.__init__(self, player, level_loader.load_level("level_01"))
 
-        # Call the parent constructor
-        Level.__init__(self, player)
 
-        self.level_limit = -1000
-
-        # Array with type of platform, and x, y location of the platform.
-        level = [[210, 70, 500, 550],
-                 [210, 70, 800, 400],
-                 [210, 70, 1000, 500],
-                 [210, 70, 1120, 280],
-                 ]
-
-        # Go through the array above and add platforms
-        for platform in level:
-            block = Platform(platform[0], platform[1])
-            block.rect.x = platform[2]
-            block.rect.y = platform[3]
-            block.player = self.player
-            self.platform_list.add(block)
+# Create platforms for the level
+class Level_02(DataLevel):
+    """ Definition for level 2. """
 
-        # Add a custom moving platform
-        block = MovingPlatform(70, 70)
-        block.rect.x = 1500
-        block.rect.y = 300
-        block.boundary_top = 100
-        block.boundary_bottom = 550
-        block.change_y = -1
-        block.player = self.player
-        block.level = self
-        self.platform_list.add(block)
-
-
-def main():
-    """ Main Program """
-    DOWNSCALE_FACTOR = 5
+    def __init__(self, player):
+        """ Create level 2. """
+        DataLevel.__init__(self, player, level_loader.load_level("level_02"))
+
+
+class GeneratedLevel(DataLevel):
+    """ A procedurally generated level, see level_generator.generate_level
+        for the keyword arguments. """
+
+    def __init__(self, player, seed, **kwargs):
+        """ Create the level for the given seed. """
+        DataLevel.__init__(self, player, level_generator.generate_compiled(seed, **kwargs))
+
+
+def human_action(pressed=()):
+    """ Map the arrow keys to one of the agent's actions, or None if the
+        player is not pressing anything. pressed lists the keys that went
+        down since the last decision, so a tap between two decisions is
+        not lost. A held left or right key wins over a tapped one. """
+    keys = pygame.key.get_pressed()
+    jump = keys[pygame.K_UP] or pygame.K_UP in pressed
+    held = [key for key in (pygame.K_LEFT, pygame.K_RIGHT) if keys[key]]
+    tapped = [key for key in pressed if key in (pygame.K_LEFT, pygame.K_RIGHT)]
+    direction = (held or tapped or [None])[-1]
+    if direction == pygame.K_LEFT:
+        return 0 if jump else 1
+    if direction == pygame.K_RIGHT:
+        return 4 if jump else 3
+    if jump:
+        return 2
+    return None
+
+
+def main(record=None, config=None, demos=None, pretrain_epochs=1):
+    """ Main Program
+
+        config is a TrainingConfig, the defaults are used if it is None.
+        If record is a file name the agent is not used: the game is played
+        with the arrow keys and every step is saved there for
+        demonstrations.pretrain. The keys are read once per decision and
+        applied like the agent's actions, so the saved actions are the
+        ones that moved the player. Close the window to stop recording.
+
+        demos is a list of recorded files. The agent is pretrained on them
+        for pretrain_epochs epochs and they are put in its replay memory
+        before the first trial. """
+    if config is None:
+        config = TrainingConfig()
+    spec = ObservationSpec.from_config(config)
+    COMPUTE_ONCE_EVERY = config.compute_once_every
     max_score = 0
-    agent = ch4d.DQN((SCREEN_HEIGHT * 2 // DOWNSCALE_FACTOR, SCREEN_WIDTH // DOWNSCALE_FACTOR, 1), 5)
+    if record is None:
+        recorder = None
+        agent = ch4d.DQN(spec.shape, 5, config)
+        if demos:
+            demos = demonstrations.load_demonstrations(demos)
+            print("loaded", len(demos["actions"]), "demonstrated steps")
+            demonstrations.pretrain(agent, demos, pretrain_epochs)
+            demonstrations.push_to_memory(agent, demos)
+    else:
+        recorder = demonstrations.DemoRecorder(record)
+        agent = None
     steps = []
     trials = 1000
 
@@ -448,16 +422,15 @@ def main():
 
         # Loop until the user clicks the close button.
         done = False
+        closed = False
 
         # Used to manage how fast the screen updates
         clock = pygame.time.Clock()
         
 
         import time
-        import matplotlib.pyplot as plt
 
         score = 0
-        COMPUTE_ONCE_EVERY = 20
         max_x = player.rect.x + current_level.world_shift
         begin_time = int(time.time())
         last_right_time = int(time.time())
@@ -469,39 +442,46 @@ def main():
         agent_last_score = None
         cur_state = None
         decision_player_x = -100
-        old_frame = None
+        frames = None
         last_action = 1
+        human_idle = False
+        pressed = []
         # -------- Main Program Loop -----------
         while not done: 
             frame_counter += 1
             if frame_counter == COMPUTE_ONCE_EVERY: #and doing_bizniz == False:
                 frame_counter = 0
                 doing_bizniz = True
-                old_frame = cur_state
-                cur_state = pygame.surfarray.array3d(pygame.display.get_surface())
-                cur_state = ch4d.rgb2gray(cur_state)
-                cur_state = ch4d.block_mean(cur_state, DOWNSCALE_FACTOR)
-                cur_state = ch4d.normalize_img(cur_state)
+                frame = spec.frame()
+                frames = spec.first(frame) if frames is None else spec.push(frames, frame)
                 index_action += 1
                 agent_last_score = score
                 last_action = action
-                cur_state[0][0] = last_action
-                if old_frame is None:
-                    old_frame = cur_state
+                cur_state = (frames, last_action)
 
-                action = agent.act(np.concatenate([cur_state, old_frame]))
+                if recorder is None:
+                    action = agent.act(cur_state)
+                else:
+                    human = human_action(pressed)
+                    pressed = []
+                    human_idle = human is None
+                    if not human_idle:
+                        action = human
                 print("Action_no", index_action)
                 print("Doing: ", action)
 
 
 
-                if player.change_x < 0 or player.change_x > 0:
-                    player.stop()
-
                 decision_player_x = player.rect.x - current_level.world_shift
                 decision_player_y = player.rect.y
 
-                if action == 0:
+                if player.change_x < 0 or player.change_x > 0:
+                    player.stop()
+
+                if human_idle:
+                    # Nothing pressed while recording, stand still
+                    pass
+                elif action == 0:
                     player.jump()
                     player.go_left()
                 elif action == 1:
@@ -522,8 +502,11 @@ def main():
             for event in pygame.event.get():
                 if event.type == pygame.QUIT:
                     done = True
+                    closed = True
 
-                if event.type == pygame.KEYDOWN:
+                if event.type == pygame.KEYDOWN and recorder is not None:
+                    pressed.append(event.key)
+                elif event.type == pygame.KEYDOWN:
                     if event.key == pygame.K_LEFT:
                         player.go_left()
                     if event.key == pygame.K_RIGHT:
@@ -531,7 +514,7 @@ def main():
                     if event.key == pygame.K_UP:
                         player.jump()
 
-                if event.type == pygame.KEYUP:
+                if event.type == pygame.KEYUP and recorder is None:
                     if event.key == pygame.K_LEFT and player.change_x < 0:
                         player.stop()
                     if event.key == pygame.K_RIGHT and player.change_x > 0:
@@ -611,16 +594,13 @@ def main():
                 agent_score_delta = score - agent_last_score
 
 
-                if old_frame is not None:
+                if cur_state is not None:
                     print("added to memory")
                     print(decision_player_x)
                     print(player.rect.x - current_level.world_shift)
 
-                    new_state = pygame.surfarray.array3d(pygame.display.get_surface())
-                    new_state = ch4d.rgb2gray(new_state)
-                    new_state = ch4d.block_mean(new_state, DOWNSCALE_FACTOR)
-                    new_state = ch4d.normalize_img(new_state)
-                    new_state[0][0] = action
+                    new_frame = spec.frame()
+                    new_state = (spec.push(frames, new_frame), action)
                     if (decision_player_x == player.rect.x - current_level.world_shift and player.rect.y == decision_player_y):
                         agent_score_delta = -100 + pain_counter
                         pain_counter -= 100
@@ -628,12 +608,16 @@ def main():
                         pain_counter = 0
                     print("pushed score", agent_score_delta/100)
 
-                    if score > max_score:
-                        print("new best memory")
-                        agent.remember_best(np.concatenate([cur_state, old_frame]), action, agent_score_delta / 50, np.concatenate([new_state, cur_state]), done)
-                    
+                    if recorder is not None:
+                        if not human_idle:
+                            recorder.add(cur_state, new_frame, action, agent_score_delta / 100, done)
+                    else:
+                        if score > max_score:
+                            print("new best memory")
+                            agent.remember_best(cur_state, action, agent_score_delta / 50, new_state, done)
 
-                    agent.remember(np.concatenate([cur_state, old_frame]), action, agent_score_delta / 100, np.concatenate([new_state, cur_state]), done)
+
+                        agent.remember(cur_state, action, agent_score_delta / 100, new_state, done)
 
                 doing_bizniz = False
 
@@ -651,11 +635,28 @@ def main():
             #     agent.save_model(str(begin_time) + str(score))
             #     max_score = score
 
-            agent.replay()
-            agent.target_train()
+            if recorder is not None:
+                recorder.save()
+                print("recorded", len(recorder), "steps to", recorder.path)
+            else:
+                agent.replay()
+                agent.target_train()
         
         pygame.quit()
 
+        if recorder is not None and closed:
+            break
+
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    import argparse
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--record", metavar="FILE",
+                        help="play with the arrow keys and save the demonstration to FILE")
+    parser.add_argument("--demos", metavar="FILE", nargs="+",
+                        help="pretrain the agent on recorded demonstrations before training")
+    parser.add_argument("--pretrain-epochs", type=int, default=1)
+    args = parser.parse_args()
+    if args.record and args.demos:
+        parser.error("--demos trains the agent, it cannot be used with --record")
+    main(record=args.record, demos=args.demos, pretrain_epochs=args.pretrain_epochs)
\ No newline at end of file
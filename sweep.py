@@ -0,0 +1,179 @@
+import contextlib
+import csv
+import itertools
+import os
+import random
+import time
+import traceback
+
+import numpy as np
+
+import workers
+from config import TrainingConfig
+
+
+def grid(**axes):
+    """ Every combination of the given values, as a list of override dicts.
+        grid(gamma=[.85, .99], batch_size=[32, 64]) gives four runs. """
+    names = sorted(axes)
+    return [dict(zip(names, values)) for values in itertools.product(*(axes[name] for name in names))]
+
+
+def run_training(config, episodes, level="level_01", seed=0, model_path=None, **env_kwargs):
+    """ Headless version of the training loop in platformer_example.main.
+        Returns the stats of the run, and saves the model to model_path if
+        one is given. """
+    import environment
+    import the_brain as ch4d
+    from observation import ObservationSpec
+
+    random.seed(seed)
+    np.random.seed(seed)
+
+    env = environment.PlatformerEnv(level=level,
+                                    compute_once_every=config.compute_once_every,
+                                    observation=ObservationSpec.from_config(config),
+                                    **env_kwargs)
+    agent = ch4d.DQN(env.state_shape, env.ACTIONS, config)
+
+    start = time.time()
+    frames = 0
+    returns = []
+    distances = []
+    completed = 0
+    for episode in range(episodes):
+        state = env.reset(seed=seed + episode)
+        done = False
+        total = 0
+        while not done:
+            action = agent.act(state)
+            new_state, reward, done, info = env.step(action)
+            agent.remember(state, action, reward, new_state, done)
+            state = new_state
+            total += reward
+
+        agent.replay()
+        agent.target_train()
+
+        frames += info["frames"]
+        returns.append(total)
+        distances.append(info["distance"])
+        completed += info["completed"]
+        print("episode", episode, "return", total, "distance", info["distance"])
+
+    if model_path is not None:
+        agent.save_model(model_path)
+
+    last = max(1, episodes // 10)
+    seconds = time.time() - start
+    return {
+        "return": float(np.mean(returns[-last:])),
+        "distance": float(np.mean(distances[-last:])),
+        "best_distance": int(max(distances)),
+        "completed": completed,
+        "seconds": seconds,
+        "frames/s": frames / seconds,
+    }
+
+
+def _run(task):
+    """ Pool worker: one training run with its output in a log file. A run
+        that fails gives a row with the error instead of its stats, and the
+        traceback goes to the log. """
+    run_id, overrides, seed, episodes, level, out_dir = task
+    model_path = os.path.join(out_dir, "run_%d.h5" % run_id)
+    result = {"run": run_id, "seed": seed}
+    result.update(overrides)
+    start = time.time()
+    with open(os.path.join(out_dir, "run_%d.log" % run_id), "w") as log:
+        with contextlib.redirect_stdout(log):
+            try:
+                config = TrainingConfig().updated(**overrides)
+                result.update(run_training(config, episodes, level, seed, model_path))
+            except Exception as e:
+                traceback.print_exc(file=log)
+                result["seconds"] = time.time() - start
+                result["error"] = repr(e)
+    return result
+
+
+def run_sweep(runs, episodes, level="level_01", seeds=(0,), processes=None,
+              threads=1, out_dir="sweep"):
+    """ Train every override dict in runs once per seed on a process pool.
+
+        Each worker is pinned to threads cores and limited to that many
+        threads, so processes defaults to the number of cores divided by
+        threads. Logs and models go to out_dir. Returns one dict per run,
+        best mean distance first and failed runs (with an "error") last. """
+    os.makedirs(out_dir, exist_ok=True)
+    tasks = [(run_id, overrides, seed, episodes, level, out_dir)
+             for run_id, (overrides, seed) in enumerate(itertools.product(runs, seeds))]
+    if processes is None:
+        processes = max(1, len(workers.available_cores()) // threads)
+    processes = min(processes, len(tasks))
+
+    results = []
+    with workers.pool(processes, threads) as pool:
+        for result in pool.imap_unordered(_run, tasks):
+            print("run %d of %d %s in %.0fs" % (len(results) + 1, len(tasks),
+                                               "failed" if "error" in result else "done",
+                                               result["seconds"]))
+            results.append(result)
+
+    results.sort(key=lambda result: -result.get("distance", float("-inf")))
+    return results
+
+
+def write_table(results, path=None):
+    """ Print the results as one aligned table, and write it to path as
+        CSV if given. """
+    if not results:
+        return
+    columns = []
+    for result in results:
+        columns.extend(key for key in result if key not in columns)
+
+    rows = [[_format(result.get(column, "")) for column in columns] for result in results]
+    widths = [max(len(column), *(len(row[i]) for row in rows)) for i, column in enumerate(columns)]
+    print("  ".join(column.rjust(width) for column, width in zip(columns, widths)))
+    for row in rows:
+        print("  ".join(value.rjust(width) for value, width in zip(row, widths)))
+
+    if path is not None:
+        with open(path, "w", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=columns)
+            writer.writeheader()
+            writer.writerows(results)
+
+
+def _format(value):
+    if isinstance(value, float):
+        return "%.4g" % value
+    return str(value)
+
+
+def main():
+    import argparse
+    parser = argparse.ArgumentParser(description="Hyperparameter sweep over TrainingConfig")
+    parser.add_argument("--set", action="append", default=[], metavar="FIELD=V1,V2",
+                        help="values to try for a TrainingConfig field, can be repeated")
+    parser.add_argument("--episodes", type=int, default=100)
+    parser.add_argument("--level", default="level_01")
+    parser.add_argument("--seeds", type=int, nargs="+", default=[0])
+    parser.add_argument("--processes", type=int, default=None)
+    parser.add_argument("--threads", type=int, default=1, help="threads per run")
+    parser.add_argument("--out", default="sweep", help="directory for logs, models and results.csv")
+    args = parser.parse_args()
+
+    axes = {}
+    for setting in args.set:
+        name, values = setting.split("=", 1)
+        axes[name] = [TrainingConfig.parse_value(name, value) for value in values.split(",")]
+
+    results = run_sweep(grid(**axes), args.episodes, args.level, args.seeds,
+                        args.processes, args.threads, args.out)
+    write_table(results, os.path.join(args.out, "results.csv"))
+
+
+if __name__ == "__main__":
+    main()
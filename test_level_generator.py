@@ -0,0 +1,52 @@
+import os
+
+import pytest
+
+import level_generator
+import level_loader
+
+
+def test_pipe_taller_than_jump_blocks_level():
+    level = level_loader.compile_level({
+        "level_limit": -1000,
+        "platforms": [[800, 50, 0, 550], [70, 300, 800, 250], [2000, 50, 800, 550]],
+    })
+    assert not level_generator.is_reachable(level)
+
+
+def test_pipe_within_jump_is_reachable():
+    level = level_loader.compile_level({
+        "level_limit": -1000,
+        "platforms": [[800, 50, 0, 550], [70, 100, 800, 450], [2000, 50, 800, 550]],
+    })
+    assert level_generator.is_reachable(level)
+
+
+def test_level_01_is_reachable():
+    assert level_generator.is_reachable(level_loader.load_level("level_01"))
+
+
+def test_pipes_lower_than_jump():
+    for seed in range(50):
+        level = level_generator.generate_compiled(seed, difficulty=1, segments=("pipes",))
+        assert level_generator.is_reachable(level)
+        pipes = level.rects[(level.rects[:, 0] == 70)
+                            & (level.rects[:, 3] + level.rects[:, 1] == level_generator.FLOOR_Y)]
+        assert pipes[:, 1].max() <= level_generator.JUMP_APEX
+
+
+@pytest.mark.parametrize("seed", range(4))
+def test_generated_pipes_can_be_completed(seed):
+    """ Run right and jump all the time through a level full of the
+        tallest pipes the generator makes. """
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    environment = pytest.importorskip("environment")
+    from observation import ObservationSpec
+
+    env = environment.PlatformerEnv(level=None, difficulty=1, segments=("pipes",),
+                                    observation=ObservationSpec(1, 20), episode_seconds=60)
+    env.reset(seed=seed)
+    done = False
+    while not done:
+        state, reward, done, info = env.step(4)
+    assert info["completed"], info
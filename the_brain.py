@@ -1,22 +1,18 @@
 import numpy as np
 import random
-from keras.models import Sequential
-from keras.layers import Dense, Dropout, Conv2D, MaxPooling2D, Flatten
-from keras.optimizers import Adam
-from keras.losses import Huber
 
 from collections import deque
 
-from scipy import ndimage
+from config import TrainingConfig
+
+# Keras is only imported once a model is built, so the game, the
+# environment and the tooling around them start without TensorFlow.
 
 def block_mean(ar, fact):
     assert isinstance(fact, int), type(fact)
     sx, sy = ar.shape
-    X, Y = np.ogrid[0:sx, 0:sy]
-    regions = sy//fact * (X//fact) + Y//fact
-    res = ndimage.mean(ar, labels=regions, index=np.arange(regions.max() + 1))
-    res.shape = (sx//fact, sy//fact)
-    return res
+    assert sx % fact == 0 and sy % fact == 0, (ar.shape, fact)
+    return ar.reshape(sx // fact, fact, sy // fact, fact).mean(axis=(1, 3))
 
 def rgb2gray(img):
     R = img[:, :, 0]
@@ -28,45 +24,85 @@ def rgb2gray(img):
 def normalize_img(img):
     return img / 255
 
+def stack_states(states, n_actions):
+    """ Network inputs for a list of (frames, last_action) states: the
+        frames as float32 in [0, 1] and the last actions one hot. """
+    frames = np.stack([state[0] for state in states]).astype(np.float32) / 255
+    last_actions = np.eye(n_actions, dtype=np.float32)[[state[1] for state in states]]
+    return [frames, last_actions]
+
+# (filters, kernel, stride) of the conv layers, later ones are left out when
+# the input is too small for them
+CONV_LAYERS = ((32, 8, 4), (64, 4, 2), (64, 3, 1))
+
+def build_network(input_shape, output_shape):
+    """ Uncompiled network taking [frames, last_action one hot]. """
+    from keras.models import Model
+    from keras.layers import Input, Dense, Conv2D, Flatten, Concatenate
+
+    frames = Input(shape=tuple(input_shape))
+    last_action = Input(shape=(output_shape,))
+    x = frames
+    height, width = input_shape[:2]
+    for filters, kernel, stride in CONV_LAYERS:
+        if height < kernel or width < kernel:
+            break
+        x = Conv2D(filters, kernel, strides=(stride, stride), padding="valid", activation="relu")(x)
+        height = (height - kernel) // stride + 1
+        width = (width - kernel) // stride + 1
+    x = Flatten()(x)
+    x = Concatenate()([x, last_action])
+    x = Dense(512, activation="relu")(x)
+    return Model(inputs=[frames, last_action], outputs=Dense(output_shape)(x))
+
 class DQN:
-    def __init__(self, input_shape, output_shape):
+    """ States are (frames, last_action) pairs, see
+        observation.ObservationSpec. input_shape is the shape of the frames,
+        output_shape the number of actions. """
+
+    def __init__(self, input_shape, output_shape, config=None):
+        if config is None:
+            config = TrainingConfig()
+        self.config = config
         self.input_shape  = input_shape
         self.output_shape = output_shape
-        self.memory  = deque(maxlen=10000)
-        self.best_memories = deque(maxlen=100)
-        self.random_memories = deque(maxlen=100)
+        self.memory  = deque(maxlen=config.memory_size)
+        self.best_memories = deque(maxlen=config.best_memory_size)
+        self.random_memories = deque(maxlen=config.random_memory_size)
         
-        self.gamma = 0.85
-        self.epsilon = 1
-        self.epsilon_min = 0.01
-        self.epsilon_decay = 0.995
-        self.learning_rate = 0.05
-        self.tau = .125
+        self.gamma = config.gamma
+        self.epsilon = config.epsilon
+        self.epsilon_min = config.epsilon_min
+        self.epsilon_decay = config.epsilon_decay
+        self.learning_rate = config.learning_rate
+        self.tau = config.tau
+        self.batch_size = config.batch_size
 
         self.model        = self.create_model()
-        self.target_model = self.create_model()
+        self.target_model = self.create_target_model()
 
     def create_model(self):
-        model   = Sequential()
-        state_shape  = self.input_shape
-        model.add(Conv2D(32, 8, strides=(4, 4), padding="valid",activation="relu", input_shape = state_shape))
-        model.add(Conv2D(64, 4, strides=(2, 2), padding="valid",activation="relu", input_shape = state_shape))
-        model.add(Conv2D(64, 3, strides=(1, 1), padding="valid",activation="relu", input_shape = state_shape))
-        model.add(Flatten())
-        model.add(Dense(512, activation="relu"))
-        model.add(Dense(self.output_shape))
+        from keras.optimizers import Adam
+        from keras.losses import Huber
+
+        model = build_network(self.input_shape, self.output_shape)
         model.compile(loss=Huber(),
-            optimizer=Adam(lr=self.learning_rate))
+            optimizer=Adam(learning_rate=self.learning_rate))
         return model
 
+    def create_target_model(self):
+        """ Copy of self.model. It only predicts, so it is not compiled. """
+        target_model = build_network(self.input_shape, self.output_shape)
+        target_model.set_weights(self.model.get_weights())
+        return target_model
+
     def act(self, state):
         self.epsilon *= self.epsilon_decay
         self.epsilon = max(self.epsilon_min, self.epsilon)
         if np.random.random() < self.epsilon:
             return np.random.randint(0, self.output_shape)
 
-        state = np.array([state.reshape(self.input_shape)])
-        predicted = self.model.predict(state)[0]
+        predicted = self.model.predict(stack_states([state], self.output_shape))[0]
         print("I do think ", predicted)
         return np.argmax(predicted)
 
@@ -80,7 +116,7 @@ class DQN:
         self.random_memories.append([state, action, reward, new_state, done])
 
     def replay(self):
-        batch_size = 32
+        batch_size = self.batch_size
         memory = []
         memory.extend(self.memory)
         memory.extend(self.best_memories)
@@ -92,19 +128,29 @@ class DQN:
         samples = random.sample(memory, batch_size)
         for sample in samples:
             state, action, reward, new_state, done = sample
-            import matplotlib.pyplot as plt
-            #plt.imshow(state, cmap=plt.get_cmap('gray')) #Needs to be in row,col order
-            #plt.savefig("old.png")
-            #plt.imshow(new_state, cmap=plt.get_cmap('gray')) #Needs to be in row,col order
-            #plt.savefig("nou.png")
-            target = self.target_model.predict(np.array([state.reshape(self.input_shape)]))
+            inputs = stack_states([state], self.output_shape)
+            target = self.target_model.predict(inputs)
             if done:
                 target[0][action] = reward
             else:
-                target_model_pred = self.target_model.predict(np.array([new_state.reshape(self.input_shape)]))
+                target_model_pred = self.target_model.predict(stack_states([new_state], self.output_shape))
                 Q_future = max(target_model_pred[0])
                 target[0][action] = reward + Q_future * self.gamma
-            self.model.fit(np.array([state.reshape(self.input_shape)]), target, epochs=1, verbose=0)
+            self.model.fit(inputs, target, epochs=1, verbose=0)
+
+    def fit_batch(self, states, actions, rewards, new_states, dones):
+        """ Same update as replay, but for a whole batch of transitions
+            in one predict/fit call. """
+        inputs = stack_states(states, self.output_shape)
+        new_inputs = stack_states(new_states, self.output_shape)
+        actions = np.asarray(actions, dtype=np.int64)
+        rewards = np.asarray(rewards, dtype=np.float32)
+        dones = np.asarray(dones, dtype=bool)
+
+        target = self.target_model.predict(inputs)
+        Q_future = self.target_model.predict(new_inputs).max(axis=1)
+        target[np.arange(len(actions)), actions] = rewards + np.where(dones, 0, Q_future * self.gamma)
+        self.model.fit(inputs, target, batch_size=len(actions), epochs=1, verbose=0)
 
     def target_train(self):
         weights = self.model.get_weights()
@@ -0,0 +1,58 @@
+import multiprocessing
+import os
+
+# Thread count variables of the numeric libraries. Children started with
+# "spawn" inherit them before they import TensorFlow, which reads them
+# when it starts up.
+THREAD_VARS = ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS",
+               "TF_NUM_INTRAOP_THREADS")
+
+
+def limit_threads(threads, force=True):
+    """ Bound the threads of this process and of the ones it starts.
+        Unless force is True, values that are already set are kept. """
+    values = dict.fromkeys(THREAD_VARS, str(threads))
+    values["TF_NUM_INTEROP_THREADS"] = "1"
+    for key, value in values.items():
+        if force:
+            os.environ[key] = value
+        else:
+            os.environ.setdefault(key, value)
+    os.environ.setdefault("TF_CPP_MIN_LOG_LEVEL", "2")
+
+
+def pin_to_cores(cores):
+    """ Restrict this process to the given cores. Only Linux supports
+        this, elsewhere it does nothing. """
+    if hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, cores)
+
+
+def available_cores():
+    if hasattr(os, "sched_getaffinity"):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count()))
+
+
+def pool(processes, threads=1, initializer=None, initargs=()):
+    """ Spawn based process pool (TensorFlow does not survive a fork).
+        Every worker gets its own threads cores, wrapping around if there
+        are not enough, and then runs initializer(*initargs).
+        The thread limits are only forced inside the workers, in this
+        process they are set only where the caller has not set them. """
+    ctx = multiprocessing.get_context("spawn")
+    cores = available_cores()
+    slots = ctx.Queue()
+    for i in range(processes):
+        slots.put([cores[(i * threads + j) % len(cores)] for j in range(threads)])
+
+    limit_threads(threads, force=False)
+    return ctx.Pool(processes, initializer=_init_worker,
+                    initargs=(slots, threads, initializer, initargs))
+
+
+def _init_worker(slots, threads, initializer, initargs):
+    pin_to_cores(slots.get())
+    limit_threads(threads)
+    if initializer is not None:
+        initializer(*initargs)